@@ -1,11 +1,18 @@
 import typing
 from abc import ABC
 
+from source_map import SourceMapOutput
+
 
 def get_indent(size: int) -> str:
     return "\t" * size
 
 
+def mark_source_line(output_file: typing.TextIO, line: int) -> None:
+    if isinstance(output_file, SourceMapOutput):
+        output_file.mark(line)
+
+
 class Action(ABC):
     line: int
 
@@ -51,6 +58,20 @@ class CNativeType(Type):
         pass
 
 
+def create_builtin_types() -> dict[str, Type]:
+    types: dict[str, Type] = {
+        n: CNativeType(-1, n, True)
+        for n in
+        {"char", "int", "short", "long"}
+    }
+    types.update({
+        n: CNativeType(-1, n)
+        for n in
+        {"double", "float"}
+    })
+    return types
+
+
 class Context(Action):
     actions: list[Action]
 
@@ -76,21 +97,11 @@ class TopLevel(Context):
     types: dict[str, Type]
     functions: dict[str, 'Function']
 
-    def __init__(self, line: int) -> None:
+    def __init__(self, line: int, builtin_types: typing.Optional[dict[str, Type]] = None) -> None:
         Context.__init__(self, line)
-        self.types = {
-            n: CNativeType(-1, n, True)
-            for n in
-            {"char", "int", "short", "long"}
-        }
-        self.types.update({
-            n: CNativeType(-1, n)
-            for n in
-            {"double", "float"}
-        })
+        self.types = dict(builtin_types) if builtin_types is not None else create_builtin_types()
         self.functions = {}
         self.entry_point = None
-        breakpoint()
 
     def add_action(self, action: Action) -> None:
         if isinstance(action, Function):
@@ -145,6 +156,7 @@ class Function(Context):
                 self.actions.append(CCommand(-1, f"(void){p.name}"))
 
     def write(self, output_file: typing.TextIO, indent: int) -> None:
+        mark_source_line(output_file, self.line)
         print(
             "{} {}({})".format(
                 self.__return_type, self.__name,
@@ -176,6 +188,7 @@ class Comment(Action):
     def write(self, output_file: typing.TextIO, indent: int) -> None:
         if not self.message:
             return
+        mark_source_line(output_file, self.line)
         print(f"{get_indent(indent)}/* {self.message} */", file=output_file)
 
 
@@ -189,6 +202,7 @@ class CPreprocessorDirective(Action):
     def write(self, output_file: typing.TextIO, indent: int) -> None:
         if not self.value:
             return
+        mark_source_line(output_file, self.line)
         print(f"#{self.value}", file=output_file)
 
 
@@ -202,6 +216,7 @@ class CCommand(Action):
     def write(self, output_file: typing.TextIO, indent: int) -> None:
         if not self.cmd:
             return
+        mark_source_line(output_file, self.line)
         print(f"{get_indent(indent)}{self.cmd};", file=output_file)
 
 
@@ -213,6 +228,7 @@ class Return(Action):
         self.value = value
 
     def write(self, output_file: typing.TextIO, indent: int) -> None:
+        mark_source_line(output_file, self.line)
         if self.value == "void":
             print(f"{get_indent(indent)}return;", file=output_file)
         else:
@@ -0,0 +1,200 @@
+import difflib
+import io
+import random
+import sys
+import time
+import tracemalloc
+import typing
+from collections.abc import Callable, Sequence
+
+from main import Transpiler
+from run import build_tree
+
+C_TYPES = ("char", "int", "short", "long", "float", "double")
+
+
+def generate_function(rng: random.Random, names: typing.Iterator[str], depth: int, max_depth: int) -> list[str]:
+    indent = "\t" * depth
+    name = next(names)
+    params = ", ".join(
+        f"{rng.choice(C_TYPES)} p_{i}"
+        for i in range(rng.randrange(4))
+    )
+    return_type = rng.choice(("none", *C_TYPES))
+
+    match rng.randrange(3):
+        case 0:
+            lines = [f"{indent}{name}:"]
+            return_type = "none"
+        case 1 if params:
+            lines = [f"{indent}{name} ({params}) -> {return_type}:"]
+        case _:
+            lines = [f"{indent}{name} -> {return_type}:"]
+
+    for _ in range(rng.randrange(1, 5)):
+        match rng.randrange(4):
+            case 0 if depth < max_depth:
+                lines.extend(generate_function(rng, names, depth + 1, max_depth))
+            case 1:
+                lines.append(f"{indent}\t# comment {rng.randrange(1000)}")
+            case _:
+                lines.append(f"{indent}\tC::> puts(\"{rng.randrange(1000)}\") # call")
+
+    if return_type == "none":
+        lines.append(f"{indent}\treturn")
+    else:
+        lines.append(f"{indent}\treturn 0")
+    return lines
+
+
+def generate_source(rng: random.Random, functions: int, max_depth: int) -> str:
+    names = (f"f_{i}" for i in range(sys.maxsize))
+    lines = ["C::import global stdio.h", ""]
+    for _ in range(functions):
+        lines.extend(generate_function(rng, names, 0, max_depth))
+        lines.append("")
+    lines.extend(("main:", "\treturn 0"))
+    return "\n".join(lines) + "\n"
+
+
+class RejectedSourceError(Exception):
+    def __init__(self) -> None:
+        super().__init__("Source rejected by main.py!")
+
+
+def transpile_old(transpiler: Transpiler, source: str) -> str:
+    output = io.StringIO()
+    if not transpiler.transpile(io.StringIO(source), output):
+        raise RejectedSourceError()
+    return output.getvalue()
+
+
+def transpile_new(source: str) -> str:
+    output = io.StringIO()
+    build_tree(io.StringIO(source)).write(output)
+    return output.getvalue()
+
+
+def normalized(c_source: str) -> list[str]:
+    # indentation and blank lines differ between the engines without changing the program
+    return [line.strip() for line in c_source.splitlines() if line.strip()]
+
+
+def run_engine(engine: Callable[[str], str], source: str) -> tuple[bool, list[str]]:
+    try:
+        return True, normalized(engine(source))
+    except Exception as e:
+        return False, [f"raised {type(e).__name__}: {e}"]
+
+
+def measure(engine: Callable[[str], str], corpus: Sequence[str], repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for source in corpus:
+            engine(source)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        for source in corpus:
+            engine(source)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def report(
+        title: str,
+        old_engine: Callable[[str], str],
+        new_engine: Callable[[str], str],
+        corpus: Sequence[str],
+        repeat: int
+) -> None:
+    print(title)
+    if not corpus:
+        print("\tno files")
+        return
+
+    lines = sum(source.count("\n") for source in corpus)
+    old_time, old_peak = measure(old_engine, corpus, repeat)
+    new_time, new_peak = measure(new_engine, corpus, repeat)
+
+    print(f"\t{'engine':10}{'lines/s':>14}{'peak memory':>14}")
+    print(f"\t{'main.py':10}{lines / old_time:>14.0f}{old_peak:>14}")
+    print(f"\t{'run.py':10}{lines / new_time:>14.0f}{new_peak:>14}")
+    print(f"\trun.py throughput is {old_time / new_time:.2f}x main.py")
+
+
+def main(*args: str) -> int:
+    options = dict(arg.partition("=")[::2] for arg in args[1:] if arg.startswith("--"))
+    filepaths = [arg for arg in args[1:] if not arg.startswith("--")]
+
+    if unknown_options := options.keys() - {"--files", "--functions", "--depth", "--seed", "--repeat", "--show"}:
+        print(f"Unknown options {', '.join(sorted(unknown_options))}!", file=sys.stderr)
+        print(
+            f"Usage: {args[0] if args else 'compare.py'} [--files=N] [--functions=N] [--depth=N]"
+            f" [--seed=N] [--repeat=N] [--show=N] [SOURCE_FILE...]",
+            file=sys.stderr
+        )
+        return 2
+    try:
+        files, functions, depth, seed, repeat, show = (
+            int(options.get(name, default))
+            for name, default in (
+                ("--files", 100), ("--functions", 10), ("--depth", 3),
+                ("--seed", 0), ("--repeat", 3), ("--show", 3)
+            )
+        )
+    except ValueError:
+        print("Options need integer values!", file=sys.stderr)
+        return 2
+
+    corpus: list[str]
+    if filepaths:
+        corpus = []
+        for filepath in filepaths:
+            with open(filepath, 'r') as file:
+                corpus.append(file.read())
+    else:
+        rng = random.Random(seed)
+        corpus = [generate_source(rng, functions, depth) for _ in range(files)]
+        filepaths = [f"<generated {i}>" for i in range(files)]
+
+    transpiler = Transpiler()
+
+    def old_engine(source: str) -> str:
+        return transpile_old(transpiler, source)
+
+    differing = 0
+    accepted: list[str] = []
+    equivalent: list[str] = []
+    for filepath, source in zip(filepaths, corpus):
+        (old_ok, old), (new_ok, new) = run_engine(old_engine, source), run_engine(transpile_new, source)
+        if old_ok and new_ok:
+            accepted.append(source)
+        if old_ok and new_ok and old == new:
+            equivalent.append(source)
+            continue
+        differing += 1
+        if differing <= show:
+            sys.stdout.writelines(
+                f"{line}\n" for line in
+                difflib.unified_diff(old, new, f"{filepath} (main.py)", f"{filepath} (run.py)", lineterm="")
+            )
+
+    print(f"{len(equivalent)}/{len(corpus)} files emit equivalent C")
+    print(f"{len(accepted)}/{len(corpus)} files are accepted by both engines")
+    report("Files emitting equivalent C:", old_engine, transpile_new, equivalent, repeat)
+    if len(accepted) > len(equivalent):
+        report(
+            "Files accepted by both engines, output differs for some so the engines may do different work:",
+            old_engine, transpile_new, accepted, repeat
+        )
+
+    return 1 if differing else 0
+
+
+if __name__ == '__main__':
+    exit(main(*sys.argv))
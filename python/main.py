@@ -1,9 +1,12 @@
 import re
 import sys
+import time
 import typing
 import os.path
 
 import actions
+from metrics import TranspileMetrics
+from source_map import CountingOutput, SourceMapOutput
 
 params_pattern = re.compile(r"^\((.*)\)$")
 param_split_pattern = re.compile(r", ?")
@@ -16,7 +19,8 @@ def add_function(
         context_stack: list[actions.Context],
         function_name: str,
         return_type: str,
-        args: list[str]
+        args: list[str],
+        node_counts: dict[str, int]
 ) -> bool:
     function_context: actions.Function
 
@@ -57,6 +61,9 @@ def add_function(
         return_type = "void"
 
     function_context = actions.Function(i, function_name, return_type, tuple(parameters))
+    node_counts["Function"] += 1
+    # unused parameters are voided with a CCommand each
+    node_counts["CCommand"] += sum(1 for p in parameters if p.unused)
     # top_level.add_action(function_context)
     context_stack.append(function_context)
     return True
@@ -67,7 +74,8 @@ def add_normal_flow(
         top_level: actions.TopLevel,
         line: str,
         i: int,
-        args: list[str]
+        args: list[str],
+        node_counts: dict[str, int]
 ) -> bool:
     match args:
         case ["return", value]:
@@ -78,6 +86,7 @@ def add_normal_flow(
                 )
                 return False
             context_stack[-1].add_action(actions.Return(i, value))
+            node_counts["Return"] += 1
 
         case ["return"]:
             if context_stack[-1] == top_level:
@@ -87,10 +96,12 @@ def add_normal_flow(
                 )
                 return False
             context_stack[-1].add_action(actions.Return(i))
+            node_counts["Return"] += 1
 
         case ["C::>", *c_args]:
             c_cmd = " ".join(c_args)
             context_stack[-1].add_action(actions.CCommand(i, c_cmd))
+            node_counts["CCommand"] += 1
 
         case _:
             print(f"Line {i} invalid:\n{line.rstrip()}", file=sys.stderr)
@@ -105,95 +116,313 @@ def pop_context_to(indent: int, context_stack: list[actions.Context], top_level:
             top_level.add_action(ctx)
 
 
-def transpile(input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+def split_action_line(line: str) -> typing.Optional[tuple[int, str, typing.Optional[str]]]:
+    """
+    Splits a line into indent, code and trailing comment in linear time, the
+    comment starts at the first '#' followed by at most one whitespace and a
+    non whitespace character. Returns None for lines that are not actions.
+    """
+    if line[-1:] == '\n':
+        line = line[:-1]
+    rest = line.lstrip('\t')
+    if not rest or rest[0].isspace() or '\n' in rest:
+        return None
+
+    comment_start = rest.find('#', 1)
+    while comment_start != -1:
+        comment = rest[comment_start + 1:comment_start + 3]
+        if comment[:1] and not comment[0].isspace():
+            return len(line) - len(rest), rest[:comment_start].rstrip(), rest[comment_start + 1:]
+        if comment[1:] and not comment[1].isspace():
+            return len(line) - len(rest), rest[:comment_start].rstrip(), rest[comment_start + 2:]
+        comment_start = rest.find('#', comment_start + 1)
+
+    return len(line) - len(rest), rest.rstrip(), None
+
+
+class ResourceLimits:
+    """
+    Limits checked before a line is matched, sizes are counted in characters.
+    """
+    max_line_length: int
+    max_nesting_depth: int
+    max_file_size: int
+
+    def __init__(
+            self,
+            max_line_length: int = 64 * 1024,
+            max_nesting_depth: int = 256,
+            max_file_size: int = 64 * 1024 * 1024
+    ) -> None:
+        for name, value in (
+                ("max_line_length", max_line_length),
+                ("max_nesting_depth", max_nesting_depth),
+                ("max_file_size", max_file_size)
+        ):
+            if value < 1:
+                raise ValueError(f"Resource limit {name} must be at least 1, got {value}!")
+        self.max_line_length = max_line_length
+        self.max_nesting_depth = max_nesting_depth
+        self.max_file_size = max_file_size
+
+
+class Transpiler:
+    """
+    Parser session owning the compiled patterns, the builtin type table and
+    the context stack, reused across transpile calls.
+
+    A session is not thread safe, concurrent callers need a session each.
+    """
     comment_pattern = re.compile(r"^(\t*)#\s*(.*?)\n?$")
-    action_pattern = re.compile(r"^(\t*)(\S.*?)\s*(?:#\s?(\S.*?))?\n?$")
     empty_pattern = re.compile(r"^\s*?\n?$")
 
-    # param_pattern = re.compile(r"\w[_\w\d]*")
-
-    top_level = actions.TopLevel(-1)
-    context_stack: list[actions.Context] = [top_level]
-
-    line: str
-    for i, line in enumerate(input_file):
-        # print(line, file=output_file, end='')
-        if empty_pattern.match(line):
-            continue
-
-        if m := comment_pattern.match(line):
-            context_stack[-1].add_action(actions.Comment(i, m[2]))
-            continue
-
-        if m := action_pattern.match(line):
-            pop_context_to(len(m[1]), context_stack, top_level)
-
-            match m[2].split():
-                # special flow
-                case ["main:"]:
-                    main_context = actions.Main(i)
-                    top_level.entry_point = main_context
-                    context_stack.append(main_context)
-
-                case [function_name, *args, "->", return_type]:
-                    if not add_function(line, i, context_stack, function_name, return_type, args):
-                        return
-
-                case [value] if value[-1] == ':' and value[:-1] not in ("else",):
-                    function_context = actions.Function(i, value[:-1])
-                    # top_level.add_action(function_context)
-                    context_stack.append(function_context)
-
-                case ["C::import", "local", *args]:
-                    filename = " ".join(args)
-                    directive = actions.CPreprocessorDirective(i, f"include \"{filename}\"")
-                    context_stack[-1].add_action(directive)
-                case ["C::import", "global", *args]:
-                    filename = " ".join(args)
-                    directive = actions.CPreprocessorDirective(i, f"include <{filename}>")
-                    context_stack[-1].add_action(directive)
-                case ["C::import", *args]:
-                    filename = " ".join(args)
-                    directive = actions.CPreprocessorDirective(i, f"include <{filename}>")
-                    context_stack[-1].add_action(directive)
-
-                # normal flow
-                case args:
-                    if m[3]:
-                        context_stack[-1].add_action(actions.Comment(i, m[3]))
-                    if not add_normal_flow(context_stack, top_level, line, i, args):
-                        return
-            continue
-
-        print(f"Line {i} did not match any pattern:\n{line.rstrip()}", file=sys.stderr)
-        return
-
-    pop_context_to(0, context_stack, top_level)
-
-    top_level.write(output_file)
-
-
-def transpile_files(input_filepath: str, output_filepath: str) -> None:
+    builtin_types: dict[str, actions.Type]
+    context_stack: list[actions.Context]
+    limits: ResourceLimits
+    metrics: TranspileMetrics
+
+    def __init__(self, limits: typing.Optional[ResourceLimits] = None) -> None:
+        self.builtin_types = actions.create_builtin_types()
+        self.context_stack = []
+        self.limits = limits if limits is not None else ResourceLimits()
+        self.metrics = TranspileMetrics()
+
+    def reset(self) -> None:
+        self.context_stack.clear()
+
+    def transpile(self, input_file: typing.TextIO, output_file: typing.TextIO) -> bool:
+        metrics = self.metrics
+        metrics.files += 1
+        try:
+            start = time.perf_counter_ns()
+            top_level = self.parse(input_file)
+            parsed = time.perf_counter_ns()
+            metrics.parse_time_ns += parsed - start
+            if top_level is None:
+                metrics.failed_files += 1
+                return False
+
+            output = output_file if isinstance(output_file, CountingOutput) else CountingOutput(output_file)
+            characters = output.characters
+            top_level.write(typing.cast(typing.TextIO, output))
+            metrics.write_time_ns += time.perf_counter_ns() - parsed
+            metrics.emitted_characters += output.characters - characters
+            return True
+        finally:
+            self.reset()
+
+    def parse(self, input_file: typing.TextIO) -> typing.Optional[actions.TopLevel]:
+        """
+        Builds the tree without writing it, updating the line and node counters.
+        Returns None if the input is rejected.
+        """
+        try:
+            return self.__parse(input_file)
+        finally:
+            self.reset()
+
+    def __parse(self, input_file: typing.TextIO) -> typing.Optional[actions.TopLevel]:
+        comment_pattern = self.comment_pattern
+        empty_pattern = self.empty_pattern
+
+        # param_pattern = re.compile(r"\w[_\w\d]*")
+
+        node_counts = self.metrics.node_counts
+
+        top_level = actions.TopLevel(-1, self.builtin_types)
+        node_counts["TopLevel"] += 1
+        context_stack = self.context_stack
+        context_stack.append(top_level)
+
+        max_line_length = self.limits.max_line_length
+        max_nesting_depth = self.limits.max_nesting_depth
+        max_file_size = self.limits.max_file_size
+        file_size = 0
+        nesting_depth = 0
+        i = -1
+
+        line: str
+        # reading at most one character past the limit keeps huge lines from being loaded whole
+        for i, line in enumerate(iter(lambda: input_file.readline(max_line_length + 1), "")):
+            file_size += len(line)
+            if file_size > max_file_size:
+                print(f"Line {i} exceeds maximum file size of {max_file_size} characters!", file=sys.stderr)
+                return None
+
+            if len(line) > max_line_length and line[-1] != '\n':
+                print(f"Line {i} exceeds maximum line length of {max_line_length} characters!", file=sys.stderr)
+                return None
+
+            # print(line, file=output_file, end='')
+            if empty_pattern.match(line):
+                continue
+
+            if m := comment_pattern.match(line):
+                context_stack[-1].add_action(actions.Comment(i, m[2]))
+                node_counts["Comment"] += 1
+                continue
+
+            if action := split_action_line(line):
+                code_indent, code, comment = action
+                # only action lines push contexts, blank and comment lines may be indented freely
+                if code_indent > max_nesting_depth:
+                    print(f"Line {i} exceeds maximum nesting depth of {max_nesting_depth}!", file=sys.stderr)
+                    return None
+                if code_indent > nesting_depth:
+                    nesting_depth = code_indent
+                pop_context_to(code_indent, context_stack, top_level)
+
+                match code.split():
+                    # special flow
+                    case ["main:"]:
+                        main_context = actions.Main(i)
+                        node_counts["Main"] += 1
+                        top_level.entry_point = main_context
+                        context_stack.append(main_context)
+
+                    case [function_name, *args, "->", return_type]:
+                        if not add_function(line, i, context_stack, function_name, return_type, args, node_counts):
+                            return None
+
+                    case [value] if value[-1] == ':' and value[:-1] not in ("else",):
+                        function_context = actions.Function(i, value[:-1])
+                        node_counts["Function"] += 1
+                        # top_level.add_action(function_context)
+                        context_stack.append(function_context)
+
+                    case ["C::import", "local", *args]:
+                        filename = " ".join(args)
+                        directive = actions.CPreprocessorDirective(i, f"include \"{filename}\"")
+                        context_stack[-1].add_action(directive)
+                        node_counts["CPreprocessorDirective"] += 1
+                    case ["C::import", "global", *args]:
+                        filename = " ".join(args)
+                        directive = actions.CPreprocessorDirective(i, f"include <{filename}>")
+                        context_stack[-1].add_action(directive)
+                        node_counts["CPreprocessorDirective"] += 1
+                    case ["C::import", *args]:
+                        filename = " ".join(args)
+                        directive = actions.CPreprocessorDirective(i, f"include <{filename}>")
+                        context_stack[-1].add_action(directive)
+                        node_counts["CPreprocessorDirective"] += 1
+
+                    # normal flow
+                    case args:
+                        if comment:
+                            context_stack[-1].add_action(actions.Comment(i, comment))
+                            node_counts["Comment"] += 1
+                        if not add_normal_flow(context_stack, top_level, line, i, args, node_counts):
+                            return None
+                continue
+
+            print(f"Line {i} did not match any pattern:\n{line.rstrip()}", file=sys.stderr)
+            return None
+
+        pop_context_to(0, context_stack, top_level)
+
+        metrics = self.metrics
+        metrics.lines += i + 1
+        metrics.max_lines_per_file = max(metrics.max_lines_per_file, i + 1)
+        metrics.max_nesting_depth = max(metrics.max_nesting_depth, nesting_depth)
+
+        return top_level
+
+
+def transpile(input_file: typing.TextIO, output_file: typing.TextIO) -> bool:
+    return Transpiler().transpile(input_file, output_file)
+
+
+def transpile_files(
+        input_filepath: str,
+        output_filepath: str,
+        line_directives: bool = False,
+        source_map: bool = False,
+        transpiler: typing.Optional[Transpiler] = None
+) -> bool:
+    if transpiler is None:
+        transpiler = Transpiler()
+
+    output: typing.Optional[SourceMapOutput] = None
     with open(input_filepath, 'r') as i_file:
         with open(output_filepath, 'w') as o_file:
-            transpile(i_file, o_file)
+            if not line_directives and not source_map:
+                ok = transpiler.transpile(i_file, o_file)
+            else:
+                output = SourceMapOutput(o_file, input_filepath, line_directives)
+                ok = transpiler.transpile(i_file, typing.cast(typing.TextIO, output))
+
+    if not ok:
+        os.remove(output_filepath)
+        return False
+
+    if source_map and output:
+        with open(f"{output_filepath}.map", 'w') as m_file:
+            output.write_source_map(
+                m_file,
+                os.path.basename(output_filepath),
+                os.path.relpath(input_filepath, os.path.dirname(os.path.abspath(output_filepath)))
+            )
+    return True
+
+
+FLAG_OPTIONS = ("--line-directives", "--source-map")
+LIMIT_OPTIONS = ("--max-line-length", "--max-nesting-depth", "--max-file-size")
+METRICS_OPTIONS = ("--metrics-json", "--metrics-prometheus")
+
+
+def write_metrics(metrics: TranspileMetrics, options: dict[str, str]) -> None:
+    if json_filepath := options.get("--metrics-json"):
+        with open(json_filepath, 'w') as m_file:
+            print(metrics.to_json(), file=m_file)
+    if prometheus_filepath := options.get("--metrics-prometheus"):
+        with open(prometheus_filepath, 'w') as m_file:
+            m_file.write(metrics.to_prometheus())
 
 
 def main(*args: str) -> int:
+    options = dict(arg.partition("=")[::2] for arg in args[1:] if arg.startswith("--"))
+    args = args[:1] + tuple(arg for arg in args[1:] if not arg.startswith("--"))
+
+    if unknown_options := options.keys() - {*FLAG_OPTIONS, *LIMIT_OPTIONS, *METRICS_OPTIONS}:
+        print(f"Unknown options {', '.join(sorted(unknown_options))}!")
+        return 1
+    line_directives = "--line-directives" in options
+    source_map = "--source-map" in options
+
+    limits: typing.Optional[ResourceLimits] = None
+    if limit_options := options.keys() & set(LIMIT_OPTIONS):
+        try:
+            limits = ResourceLimits(**{
+                name[2:].replace("-", "_"): int(options[name])
+                for name in limit_options
+            })
+        except ValueError:
+            print(f"Options {', '.join(sorted(limit_options))} need positive integer values!")
+            return 1
+    transpiler = Transpiler(limits)
+    ok = True
+
     match args:
         case []:
             print("Invalid call to main!")
             return 1
         case [_, input_filepath]:
             output_filepath: str = os.path.splitext(input_filepath)[0]
-            transpile_files(input_filepath, output_filepath)
-            print(f"OK, {input_filepath}!")
+            if ok := transpile_files(input_filepath, output_filepath, line_directives, source_map, transpiler):
+                print(f"OK, {input_filepath}!")
         case [_, input_filepath, output_filepath]:
-            transpile_files(input_filepath, output_filepath)
-            print(f"OK, {input_filepath}, {output_filepath}!")
+            if ok := transpile_files(input_filepath, output_filepath, line_directives, source_map, transpiler):
+                print(f"OK, {input_filepath}, {output_filepath}!")
         case [executable_file, *_]:
-            print(f"Usage: {executable_file} SOURCE_FILE [OUTPUT_FILE]")
-    return 0
+            print(
+                f"Usage: {executable_file} [--line-directives] [--source-map] [--max-line-length=N]"
+                f" [--max-nesting-depth=N] [--max-file-size=N] [--metrics-json=FILE]"
+                f" [--metrics-prometheus=FILE] SOURCE_FILE [OUTPUT_FILE]"
+            )
+            return 0
+
+    write_metrics(transpiler.metrics, options)
+    return 0 if ok else 1
 
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+import json
+import typing
+
+import actions
+
+NODE_KINDS = (
+    actions.TopLevel,
+    actions.Main,
+    actions.Function,
+    actions.Struct,
+    actions.CNativeType,
+    actions.Comment,
+    actions.CPreprocessorDirective,
+    actions.CCommand,
+    actions.Return,
+)
+
+
+class TranspileMetrics:
+    """
+    Counters updated by Transpiler, accumulated over every file it handles.
+    """
+    files: int
+    failed_files: int
+    lines: int
+    max_lines_per_file: int
+    max_nesting_depth: int
+    emitted_characters: int
+    parse_time_ns: int
+    write_time_ns: int
+    node_counts: dict[str, int]
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.failed_files = 0
+        self.lines = 0
+        self.max_lines_per_file = 0
+        self.max_nesting_depth = 0
+        self.emitted_characters = 0
+        self.parse_time_ns = 0
+        self.write_time_ns = 0
+        # keys are the class names, so counting a node only ever updates an existing entry
+        self.node_counts = {kind.__name__: 0 for kind in NODE_KINDS}
+
+    @property
+    def functions(self) -> int:
+        return self.node_counts["Function"] + self.node_counts["Main"]
+
+    def as_dict(self) -> dict[str, typing.Any]:
+        return {
+            "files": self.files,
+            "failed_files": self.failed_files,
+            "lines": self.lines,
+            "max_lines_per_file": self.max_lines_per_file,
+            "max_nesting_depth": self.max_nesting_depth,
+            "functions": self.functions,
+            "emitted_characters": self.emitted_characters,
+            "parse_time_ns": self.parse_time_ns,
+            "write_time_ns": self.write_time_ns,
+            "node_counts": dict(self.node_counts),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict())
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# TYPE indent_files_total counter",
+            f"indent_files_total {self.files}",
+            "# TYPE indent_failed_files_total counter",
+            f"indent_failed_files_total {self.failed_files}",
+            "# TYPE indent_lines_total counter",
+            f"indent_lines_total {self.lines}",
+            "# TYPE indent_max_lines_per_file gauge",
+            f"indent_max_lines_per_file {self.max_lines_per_file}",
+            "# TYPE indent_max_nesting_depth gauge",
+            f"indent_max_nesting_depth {self.max_nesting_depth}",
+            "# TYPE indent_functions_total counter",
+            f"indent_functions_total {self.functions}",
+            "# TYPE indent_emitted_characters_total counter",
+            f"indent_emitted_characters_total {self.emitted_characters}",
+            "# TYPE indent_phase_seconds_total counter",
+            f"indent_phase_seconds_total{{phase=\"parse\"}} {self.parse_time_ns / 1e9}",
+            f"indent_phase_seconds_total{{phase=\"write\"}} {self.write_time_ns / 1e9}",
+            "# TYPE indent_nodes_total counter",
+        ]
+        lines.extend(
+            f"indent_nodes_total{{kind=\"{name}\"}} {count}"
+            for name, count in self.node_counts.items()
+        )
+        return "\n".join(lines) + "\n"
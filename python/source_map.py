@@ -0,0 +1,102 @@
+import json
+import typing
+
+BASE64_DIGITS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+def vlq_encode(value: int) -> str:
+    vlq = ((-value) << 1) | 1 if value < 0 else value << 1
+    encoded: list[str] = []
+    while True:
+        digit = vlq & 0b11111
+        vlq >>= 5
+        if vlq:
+            digit |= 0b100000
+        encoded.append(BASE64_DIGITS[digit])
+        if not vlq:
+            return "".join(encoded)
+
+
+class CountingOutput:
+    """
+    Output wrapper counting emitted lines and characters.
+    """
+    line: int
+    characters: int
+
+    def __init__(self, output_file: typing.TextIO) -> None:
+        self.__output_file = output_file
+        self.line = 0
+        self.characters = 0
+
+    def write(self, text: str) -> int:
+        self.line += text.count("\n")
+        self.characters += len(text)
+        return self.__output_file.write(text)
+
+    def flush(self) -> None:
+        self.__output_file.flush()
+
+
+class SourceMapOutput(CountingOutput):
+    """
+    Output wrapper counting emitted lines, so that actions can record which
+    source line produced the generated line they are about to write.
+    """
+    source_name: str
+    line_directives: bool
+
+    def __init__(self, output_file: typing.TextIO, source_name: str, line_directives: bool = False) -> None:
+        CountingOutput.__init__(self, output_file)
+        self.__mappings: list[str] = []
+        self.__previous_source_line = 0
+        # source line the C compiler assumes for the current output line, None before any #line
+        self.__implied_source_line: typing.Optional[int] = None
+        self.__directive_line = 0
+        self.source_name = source_name
+        self.line_directives = line_directives
+        self.__escaped_source_name = source_name.replace("\\", "\\\\").replace("\"", "\\\"")
+
+    def mark(self, source_line: int) -> None:
+        if source_line < 0:
+            return
+
+        if self.line_directives:
+            if self.__implied_source_line is not None:
+                self.__implied_source_line += self.line - self.__directive_line
+            if self.__implied_source_line != source_line:
+                self.write(f"#line {source_line + 1} \"{self.__escaped_source_name}\"\n")
+                self.__implied_source_line = source_line
+            self.__directive_line = self.line
+
+        if len(self.__mappings) > self.line:
+            return
+        self.__mappings.extend("" for _ in range(self.line - len(self.__mappings)))
+        self.__mappings.append(
+            f"AA{vlq_encode(source_line - self.__previous_source_line)}A"
+        )
+        self.__previous_source_line = source_line
+
+    @property
+    def mappings(self) -> str:
+        return ";".join(self.__mappings)
+
+    def source_map(self, generated_name: str, source_path: typing.Optional[str] = None) -> dict[str, typing.Any]:
+        """
+        source_path is the source as seen from the map file, defaults to source_name.
+        """
+        return {
+            "version": 3,
+            "file": generated_name,
+            "sources": [source_path if source_path is not None else self.source_name],
+            "names": [],
+            "mappings": self.mappings,
+        }
+
+    def write_source_map(
+            self,
+            map_file: typing.TextIO,
+            generated_name: str,
+            source_path: typing.Optional[str] = None
+    ) -> None:
+        json.dump(self.source_map(generated_name, source_path), map_file)
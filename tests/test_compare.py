@@ -0,0 +1,33 @@
+import random
+
+import compare
+
+
+def test_generated_functions_have_valid_parameters() -> None:
+    rng = random.Random(0)
+    for _ in range(50):
+        source = compare.generate_source(rng, 10, 3)
+        assert "()" not in source
+        assert "main:\n" in source
+
+
+def test_rejected_sources_are_not_timed(tmp_path, capsys) -> None:
+    bad = tmp_path / "bad.indent"
+    bad.write_text("f (int a, ) -> int:\n\treturn a\n")
+    good = tmp_path / "good.indent"
+    good.write_text("f (int a) -> int:\n\treturn a\n")
+
+    assert compare.main("compare.py", "--repeat=1", str(bad), str(good)) == 1
+    out = capsys.readouterr().out
+    assert "raised SourceCodeError" in out
+    assert "1/2 files are accepted by both engines" in out
+
+
+def test_equivalent_sources_pass(tmp_path, capsys) -> None:
+    empty = tmp_path / "empty.indent"
+    empty.write_text("\n")
+
+    assert compare.main("compare.py", "--repeat=1", str(empty)) == 0
+    out = capsys.readouterr().out
+    assert "1/1 files emit equivalent C" in out
+    assert "may do different work" not in out
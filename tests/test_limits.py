@@ -0,0 +1,108 @@
+import io
+import re
+import time
+
+import pytest
+
+import main
+from main import ResourceLimits, Transpiler, split_action_line
+
+
+def transpile(source: str, limits: ResourceLimits | None = None) -> tuple[bool, str]:
+    output = io.StringIO()
+    ok = Transpiler(limits).transpile(io.StringIO(source), output)
+    return ok, output.getvalue()
+
+
+@pytest.mark.parametrize("source, ok", [
+    ("main:\n\tC::> abcd\n", True),       # 10 characters, newline excluded
+    ("main:\n\tC::> abcd", True),         # 10 characters at end of file
+    ("main:\n\tC::> abcde\n", False),     # 11 characters
+    ("main:\n\tC::> abcde", False),       # 11 characters at end of file
+    ("main:\n\tC::> abcdefghij\n", False),
+])
+def test_max_line_length(source: str, ok: bool) -> None:
+    assert transpile(source, ResourceLimits(max_line_length=10))[0] is ok
+
+
+def test_max_line_length_does_not_read_whole_line() -> None:
+    source = io.StringIO("main:\n\tC::> " + "x" * 1_000_000 + "\n\treturn 0\n")
+    assert not Transpiler(ResourceLimits(max_line_length=100)).transpile(source, io.StringIO())
+    assert source.tell() < 1000
+
+
+@pytest.mark.parametrize("depth, ok", [(2, True), (3, False)])
+def test_max_nesting_depth(depth: int, ok: bool) -> None:
+    source = "f:\n\tg:\n\t\th:\n" + "\t" * depth + "C::> x()\n"
+    assert transpile(source, ResourceLimits(max_nesting_depth=2))[0] is ok
+
+
+@pytest.mark.parametrize("source", [
+    "main:\n\treturn 0\n\t\t\t\n",
+    "main:\n\t\t\t# comment\n\treturn 0\n",
+])
+def test_max_nesting_depth_ignores_blank_and_comment_lines(source: str) -> None:
+    assert transpile(source, ResourceLimits(max_nesting_depth=1))[0]
+
+
+@pytest.mark.parametrize("limit", ["max_line_length", "max_nesting_depth", "max_file_size"])
+@pytest.mark.parametrize("value", [0, -1])
+def test_limits_must_be_positive(limit: str, value: int) -> None:
+    with pytest.raises(ValueError):
+        ResourceLimits(**{limit: value})
+
+
+@pytest.mark.parametrize("option", ["--max-line-length=-1", "--max-nesting-depth=0", "--max-file-size=x"])
+def test_invalid_limit_fails_cli(tmp_path, capsys, option: str) -> None:
+    input_filepath = tmp_path / "a.indent"
+    input_filepath.write_text("main:\n\treturn 0\n")
+    output_filepath = tmp_path / "a.c"
+
+    assert main.main("main.py", option, str(input_filepath), str(output_filepath)) == 1
+    assert not output_filepath.exists()
+    assert "need positive integer values" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("max_file_size, ok", [(20, True), (19, False)])
+def test_max_file_size(max_file_size: int, ok: bool) -> None:
+    source = "main:\n\treturn 0\n\n\n\n\n"
+    assert len(source) == 20
+    assert transpile(source, ResourceLimits(max_file_size=max_file_size))[0] is ok
+
+
+def test_pathological_line_is_linear() -> None:
+    start = time.perf_counter()
+    ok, output = transpile("main:\n\tC::> x" + " " * 64000 + "y\n")
+    assert ok
+    assert "\tx y;" in output
+    assert time.perf_counter() - start < 1
+
+
+ACTION_PATTERN = re.compile(r"^(\t*)(\S.*?)\s*(?:#\s?(\S.*?))?\n?$")
+
+
+@pytest.mark.parametrize("line", [
+    "\tC::> x # comment\n",
+    "\tC::> x #comment",
+    "\tC::> x #  two spaces\n",
+    "\tC::> x # \n",
+    "\tC::> x#",
+    "\tC::> x #\ta # b  ",
+    "\t\treturn  \n",
+    "\t \treturn\n",
+    "\t\n",
+    "",
+])
+def test_split_action_line_matches_pattern(line: str) -> None:
+    m = ACTION_PATTERN.match(line)
+    assert split_action_line(line) == ((len(m[1]), m[2], m[3]) if m else None)
+
+
+def test_rejected_file_fails_cli(tmp_path, capsys) -> None:
+    input_filepath = tmp_path / "long.indent"
+    input_filepath.write_text("main:\n\tC::> " + "x" * 100 + "\n")
+    output_filepath = tmp_path / "long.c"
+
+    assert main.main("main.py", "--max-line-length=50", str(input_filepath), str(output_filepath)) != 0
+    assert not output_filepath.exists()
+    assert "OK" not in capsys.readouterr().out
@@ -0,0 +1,88 @@
+import collections
+import io
+import json
+import os.path
+
+import actions
+from main import Transpiler
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.indent")
+
+NESTED = """C::import global stdio.h
+
+f (int a, char) -> int:
+\tg -> none:
+\t\tC::> puts("g") # say g
+\t\treturn
+\treturn a
+
+f:
+\t# comment
+\treturn
+
+main:
+\treturn 0
+"""
+
+
+def transpile(transpiler: Transpiler, source: str) -> None:
+    assert transpiler.transpile(io.StringIO(source), io.StringIO())
+
+
+def tree_node_counts(source: str) -> collections.Counter[str]:
+    counts: collections.Counter[str] = collections.Counter()
+
+    def count(action: actions.Action) -> None:
+        counts[type(action).__name__] += 1
+        if isinstance(action, actions.Context):
+            for child in action.actions:
+                count(child)
+
+    top_level = Transpiler().parse(io.StringIO(source))
+    assert top_level
+    count(top_level)
+    if top_level.entry_point:
+        count(top_level.entry_point)
+    return counts
+
+
+def test_node_counts_match_tree() -> None:
+    transpiler = Transpiler()
+    transpile(transpiler, NESTED)
+    expected = tree_node_counts(NESTED)
+    assert {k: v for k, v in transpiler.metrics.node_counts.items() if v} == dict(expected)
+
+
+def test_functions_with_same_name_are_counted() -> None:
+    transpiler = Transpiler()
+    with open(SOURCE) as input_file:
+        assert transpiler.transpile(input_file, io.StringIO())
+    # two nice, wow, func and main
+    assert transpiler.metrics.functions == 5
+
+
+def test_counters_accumulate_and_export() -> None:
+    transpiler = Transpiler()
+    transpile(transpiler, NESTED)
+    transpile(transpiler, NESTED)
+    assert not transpiler.transpile(io.StringIO("main:\n\t???\n"), io.StringIO())
+
+    metrics = transpiler.metrics
+    assert metrics.files == 3
+    assert metrics.failed_files == 1
+    assert metrics.lines == 2 * NESTED.count("\n")
+    assert metrics.max_nesting_depth == 2
+
+    exported = json.loads(metrics.to_json())
+    assert exported["functions"] == metrics.functions
+    assert exported["node_counts"]["Return"] == metrics.node_counts["Return"]
+
+    prometheus = metrics.to_prometheus()
+    assert f"indent_functions_total {metrics.functions}\n" in prometheus
+    assert f"indent_nodes_total{{kind=\"Return\"}} {metrics.node_counts['Return']}\n" in prometheus
+
+
+def test_max_nesting_depth_ignores_blank_and_comment_lines() -> None:
+    transpiler = Transpiler()
+    transpile(transpiler, "main:\n\t\t\t# comment\n\treturn 0\n\t\t\t\t\n")
+    assert transpiler.metrics.max_nesting_depth == 1
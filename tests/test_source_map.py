@@ -0,0 +1,116 @@
+import io
+import json
+import os.path
+
+import pytest
+
+import main
+from source_map import BASE64_DIGITS, SourceMapOutput, vlq_encode
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.indent")
+
+
+def vlq_decode(segment: str) -> list[int]:
+    values: list[int] = []
+    value = shift = 0
+    for char in segment:
+        digit = BASE64_DIGITS.index(char)
+        value |= (digit & 0b11111) << shift
+        shift += 5
+        if not digit & 0b100000:
+            values.append(-(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return values
+
+
+def decode_mappings(mappings: str) -> dict[int, int]:
+    """
+    Generated line to source line, both zero based.
+    """
+    source_lines: dict[int, int] = {}
+    source_line = 0
+    for generated_line, segments in enumerate(mappings.split(";")):
+        if segments:
+            source_line += vlq_decode(segments)[2]
+            source_lines[generated_line] = source_line
+    return source_lines
+
+
+@pytest.mark.parametrize("value, encoded", [
+    (0, "A"),
+    (1, "C"),
+    (-1, "D"),
+    (15, "e"),
+    (-15, "f"),
+    (16, "gB"),
+    (-16, "hB"),
+    (1000, "w+B"),
+    (-123456, "hkxH"),
+])
+def test_vlq_encode(value: int, encoded: str) -> None:
+    assert vlq_encode(value) == encoded
+    assert vlq_decode(encoded) == [value]
+
+
+def transpile_with_map(line_directives: bool) -> tuple[list[str], dict[int, int]]:
+    output_file = io.StringIO()
+    output = SourceMapOutput(output_file, "main.indent", line_directives)
+    with open(SOURCE) as input_file:
+        assert main.Transpiler().transpile(input_file, output)
+    return output_file.getvalue().splitlines(), decode_mappings(output.mappings)
+
+
+@pytest.mark.parametrize("line_directives", [False, True])
+def test_mappings_round_trip(line_directives: bool) -> None:
+    generated, source_lines = transpile_with_map(line_directives)
+
+    with open(SOURCE) as input_file:
+        source = input_file.read().splitlines()
+
+    expected = {
+        "#include <stdbool.h>": "C::import global stdbool.h",
+        "char wow()": "\twow -> char:",
+        "int nice(bool unused_bool_0_)": "nice (const int hello, bool) -> int:",
+        "void func()": "func:",
+        "int main()": "main:",
+        "\t/* return */": "#\treturn",
+    }
+    found = {
+        generated[generated_line]: source[source_line]
+        for generated_line, source_line in source_lines.items()
+        if generated[generated_line] in expected
+    }
+    assert found == expected
+    assert all(not generated[generated_line].startswith("#line") for generated_line in source_lines)
+
+
+def test_line_directives_match_mappings() -> None:
+    generated, source_lines = transpile_with_map(True)
+
+    implied: int | None = None
+    for generated_line, text in enumerate(generated):
+        if text.startswith("#line "):
+            implied = int(text.split()[1]) - 1
+            continue
+        if generated_line in source_lines:
+            assert implied == source_lines[generated_line]
+        if implied is not None:
+            implied += 1
+
+
+def test_line_directive_path_is_escaped() -> None:
+    output_file = io.StringIO()
+    output = SourceMapOutput(output_file, "dir\\a \"b\".indent", True)
+    output.mark(0)
+    assert output_file.getvalue() == "#line 1 \"dir\\\\a \\\"b\\\".indent\"\n"
+
+
+def test_source_map_source_is_relative_to_map(tmp_path) -> None:
+    output_filepath = tmp_path / "out" / "main.c"
+    output_filepath.parent.mkdir()
+    main.transpile_files(SOURCE, str(output_filepath), source_map=True)
+
+    with open(f"{output_filepath}.map") as map_file:
+        source_map = json.load(map_file)
+    assert source_map["file"] == "main.c"
+    assert os.path.normpath(os.path.join(output_filepath.parent, source_map["sources"][0])) == SOURCE